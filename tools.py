@@ -9,26 +9,33 @@ from __future__ import annotations
 
 import contextlib
 import io
-import itertools
 import json
 import logging
 import os
 import re
 import sys
 import tempfile
+import threading
 import zipfile
-from dataclasses import dataclass
-from fnmatch import fnmatch
-from functools import partial, reduce
-from pathlib import Path
-
-import boto3
-import more_itertools as mitertools
-import questionary
+from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import dataclass, replace
+from fnmatch import translate
+from functools import lru_cache, partial
+from importlib.metadata import version
+from itertools import compress
+from pathlib import Path, PurePath
+
 import tyro
 from botocore.exceptions import ClientError
 from natsort import natsort_key, natsorted
-from nutree import SkipBranch, StopTraversal, Tree
+from nutree import IterMethod, SkipBranch, StopTraversal, Tree
 from nutree.node import Node
 from rich.logging import RichHandler
 from rich.progress import (
@@ -45,6 +52,7 @@ from typing_extensions import (
     Annotated,
     Any,
     Callable,
+    Literal,
     Protocol,
     TypeAlias,
     cast,
@@ -52,6 +60,7 @@ from typing_extensions import (
 from tyro.extras import SubcommandApp
 
 if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
     from types_boto3_s3 import Client as S3Client
 
 logging.basicConfig(
@@ -68,7 +77,20 @@ app = SubcommandApp()
 _SIZE_SYMBOLS = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y")
 _SIZE_BOUNDS = [(1024**i, sym) for i, sym in enumerate(_SIZE_SYMBOLS)]
 _SIZE_DICT = {sym: val for val, sym in _SIZE_BOUNDS}
-_SIZE_RANGES = list(zip(_SIZE_BOUNDS, _SIZE_BOUNDS[1:]))
+_SIZE_UNIT_RE = re.compile(rf"([{''.join(_SIZE_SYMBOLS)}]?B)")
+_COPY_BUFSIZE = 4 * 1024**2
+_READAHEAD_BYTES = 8 * 1024**2
+_READAHEAD_FILES = 8
+_S3_MAX_PARTS = 10_000
+_ZIP_COMPRESSION = {
+    "lzma": zipfile.ZIP_LZMA,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "stored": zipfile.ZIP_STORED,
+}
+_STORED_SUFFIXES = frozenset(
+    (".png", ".jpg", ".jpeg", ".webp", ".mp4", ".mkv", ".mov", ".avi", ".webm")
+    + (".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".parquet")
+)
 
 
 class UpdateFn(Protocol):
@@ -93,20 +115,22 @@ def _bytes_from_str(size: str | list[str]) -> int:
     try:
         return int(size)
     except ValueError:
-        size = size.upper()
-        if not re.match(r" ", size):
-            symbols = "".join(_SIZE_SYMBOLS)
-            size = re.sub(rf"([{symbols}]?B)", r" \1", size)
+        size = size.strip().upper()
+        if " " not in size:
+            size = _SIZE_UNIT_RE.sub(r" \1", size)
         number, unit = [string.strip() for string in size.split()]
         return int(float(number) * _SIZE_DICT[unit[0]])
 
 
+@lru_cache(maxsize=4096)
 def _bytes_to_str(nbytes: int, ndigits: int = 1) -> str:
     # Based on https://boltons.readthedocs.io/en/latest/strutils.html#boltons.strutils.bytes2human
+    # The unit is the smallest one for which `abs(nbytes) <= 1024 ** (idx + 1)`,
+    # which can be directly computed from the bit length of `abs(nbytes) - 1`.
+    # The largest unit is never used, as its upper bound is not in the table.
     abs_bytes = abs(nbytes)
-    for (size, symbol), (next_size, _) in _SIZE_RANGES:
-        if abs_bytes <= next_size:
-            break
+    idx = min(max(0, ((abs_bytes - 1).bit_length() - 1) // 10), len(_SIZE_BOUNDS) - 2)
+    size, symbol = _SIZE_BOUNDS[idx]
     hnbytes = float(nbytes) / size
     return f"{hnbytes:.{ndigits}f}{symbol}"
 
@@ -144,6 +168,20 @@ def check_exists(
         return 0
 
 
+def list_objects(
+    *, s3_client: S3Client, conn: S3Connection, prefix: str | os.PathLike = ""
+) -> dict[str, int]:
+    if conn.bucket is None:
+        raise ValueError("Bucket name not specified!")
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pages = paginator.paginate(
+        Bucket=conn.bucket, Prefix=os.path.join(conn.prefix or "", prefix)
+    )
+    return {
+        obj["Key"]: obj["Size"] for page in pages for obj in page.get("Contents", [])
+    }
+
+
 def upload_file(
     src: str | os.PathLike,
     dst: str | os.PathLike,
@@ -151,6 +189,7 @@ def upload_file(
     s3_client: S3Client,
     conn: S3Connection,
     public: bool = True,
+    transfer_config: TransferConfig | None = None,
 ) -> None:
     if conn.bucket is None:
         raise ValueError("Bucket name not specified!")
@@ -162,13 +201,190 @@ def upload_file(
             conn.bucket,
             str(Path(conn.prefix or "") / dst),
             ExtraArgs=extra_args,
+            Config=transfer_config,
         )
     except ClientError as e:
         log.error(f"Failed to upload {src} to {dst}.")
         log.error(e)
 
 
-@dataclass
+class S3MultipartWriter(io.RawIOBase):
+    # Write-only, unseekable file object that uploads everything written to it as a
+    # single multipart S3 object. Parts are uploaded in the background as soon as they
+    # fill up, the first failed part is raised from the next write instead of only on
+    # close. Besides the `max_in_flight` parts being uploaded, one full part can wait
+    # for a free slot while the next one is buffered, so a writer holds up to about
+    # `(max_in_flight + 2) * part_size` bytes in memory. If known, `expected_size` is
+    # used to grow parts so the object stays under S3's part limit.
+    def __init__(
+        self,
+        key: str | os.PathLike,
+        *,
+        s3_client: S3Client,
+        conn: S3Connection,
+        public: bool = True,
+        part_size: int = _bytes_from_str("64MB"),
+        max_in_flight: int = 4,
+        expected_size: int | None = None,
+    ) -> None:
+        if conn.bucket is None:
+            raise ValueError("Bucket name not specified!")
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = conn.bucket
+        self.key = str(Path(conn.prefix or "") / key)
+        # Leave twice the headroom for incompressible data and archive overhead
+        self.part_size = max(part_size, -(-2 * (expected_size or 0) // _S3_MAX_PARTS))
+        self.nbytes = 0
+        self.buffer = bytearray()
+        self.parts: dict[int, Future] = {}
+        self.error: BaseException | None = None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+        extra_args = {"ACL": "public-read"} if public else {}
+        self.upload_id = s3_client.create_multipart_upload(
+            Bucket=self.bucket, Key=self.key, **extra_args
+        )["UploadId"]
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.nbytes
+
+    def write(self, b) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        nbytes = memoryview(b).nbytes
+        self.buffer += b
+        self.nbytes += nbytes
+
+        while len(self.buffer) >= self.part_size:
+            self._submit(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return nbytes
+
+    def _submit(self, data: bytes) -> None:
+        # Blocks the writer while too many parts are still being uploaded
+        part_number = len(self.parts) + 1
+        self.in_flight.acquire()
+        if self.error is not None:
+            self.in_flight.release()
+            raise self.error
+        future = self.executor.submit(self._upload_part, part_number, data)
+        future.add_done_callback(self._part_done)
+        self.parts[part_number] = future
+
+    def _part_done(self, future: Future) -> None:
+        # Record the first failure before freeing the part's slot, so that a writer
+        # waiting for that slot is guaranteed to see it
+        if self.error is None and not future.cancelled():
+            self.error = future.exception()
+        self.in_flight.release()
+
+    def _upload_part(self, part_number: int, data: bytes) -> str:
+        return self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )["ETag"]
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            # The last part can be smaller than `part_size`, and there has to be at least one
+            if self.buffer or not self.parts:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            parts = [
+                {"PartNumber": part_number, "ETag": future.result()}
+                for part_number, future in sorted(self.parts.items())
+            ]
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self) -> None:
+        if self.closed:
+            return
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.s3_client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+        )
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Never complete the upload of a partially written object
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def readahead(path: Path, nbytes: int = _READAHEAD_BYTES) -> None:
+    # Hint the kernel to asynchronously start reading the head of a file
+    # into the page cache, this is a no-op on platforms without `posix_fadvise`
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, nbytes, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_to_archive(
+    archive: zipfile.ZipFile,
+    path: Path,
+    *,
+    arcname: str | os.PathLike,
+    is_dir: bool = False,
+) -> None:
+    # Same as `ZipFile.write` but streams file contents with a much larger buffer
+    # than its 8KB default, which drastically reduces the number of read calls
+    if is_dir:
+        archive.write(path, arcname=arcname)
+        return
+
+    # Media and archives are already compressed, so recompressing them only burns
+    # CPU time for a negligible reduction in size, store them as-is instead
+    zinfo = zipfile.ZipInfo.from_file(path, arcname=arcname)
+    if path.suffix.lower() in _STORED_SUFFIXES:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    else:
+        # Unlike `ZipFile.write`, `ZipFile.open` does not apply the archive's level
+        zinfo.compress_type = archive.compression
+        zinfo._compresslevel = archive.compresslevel
+
+    # Read into a single reusable buffer rather than allocating a new bytes object
+    # per chunk, the zip writer only needs a view of the bytes that were read
+    buffer = bytearray(max(1, min(zinfo.file_size, _COPY_BUFSIZE)))
+    view = memoryview(buffer)
+
+    with open(path, "rb", buffering=0) as src, archive.open(zinfo, mode="w") as dst:
+        while nbytes := src.readinto(buffer):
+            dst.write(view[:nbytes])
+
+
+@dataclass(slots=True)
 class PathData:
     path: Path
     is_dir: bool | None = None
@@ -217,41 +433,216 @@ class PathData:
         )
 
 
-def is_not_hidden(path: Path) -> bool:
-    return not path.name.startswith(".")
+def is_included(path: Path) -> bool:
+    # Hidden and dunder (or private) paths are never included, checked in one go
+    return not path.name.startswith((".", "_"))
 
 
-def is_not_dunder(path: Path) -> bool:
-    return not path.name.startswith("_")
+def _glob_class_to_regex(chars: str) -> str:
+    # Translate the contents of a bracket expression the same way `fnmatch` does,
+    # a leading "!" negates it, ranges whose bounds are reversed are dropped
+    negate, chars = chars.startswith("!"), chars.removeprefix("!")
+    i, n, res = 0, len(chars), []
 
+    while i < n:
+        if i + 2 < n and chars[i + 1] == "-":
+            if chars[i] <= chars[i + 2]:
+                res.append(f"{re.escape(chars[i])}-{re.escape(chars[i + 2])}")
+            i += 3
+        else:
+            res.append(re.escape(chars[i]))
+            i += 1
+
+    if not res:
+        # An empty class never matches, an empty negated class matches anything
+        return "." if negate else "(?!)"
+    return f"[{'^' if negate else ''}{''.join(res)}]"
+
+
+def _glob_part_to_regex(part: str) -> str:
+    # Translate a single path component, unlike `fnmatch.translate` wildcards
+    # never match a path separator
+    i, n, res = 0, len(part), []
+
+    while i < n:
+        c = part[i]
+        i += 1
+
+        if c == "*":
+            res.append("[^/]*")
+        elif c == "?":
+            res.append("[^/]")
+        elif c == "[":
+            j = i
+            if j < n and part[j] == "!":
+                j += 1
+            if j < n and part[j] == "]":
+                j += 1
+            while j < n and part[j] != "]":
+                j += 1
+            if j >= n:
+                res.append(re.escape(c))
+            else:
+                res.append("(?!/)" + _glob_class_to_regex(part[i:j]))
+                i = j + 1
+        else:
+            res.append(re.escape(c))
+    return "".join(res)
+
+
+def compile_patterns(patterns: list[str] | None = None) -> re.Pattern | None:
+    """Compile glob patterns into a single regex with `Path.match` semantics.
+
+    Relative patterns are matched from the right, absolute patterns must match the
+    whole path, and wildcards never match across path separators.
 
-def is_match(path: Path, patterns: list[str] | None = None) -> bool:
-    return any(path.match(exclude_pattern) for exclude_pattern in (patterns or []))
+    Args:
+        patterns (list[str] | None, optional): Glob patterns to compile.
+
+    Returns:
+        re.Pattern | None: Regex to search paths with, None if no patterns.
+    """
+    regexes = []
 
+    for pattern in patterns or []:
+        pure = PurePath(pattern)
 
-def deepcopy(tree: Tree) -> Tree:
-    # Create deepcopy through serialization to/from memory
-    with io.StringIO() as f:
-        tree.save(f, mapper=PathData.serialize_mapper)
-        f.seek(0)
+        if not pure.parts:
+            raise ValueError(f"Empty pattern: {pattern!r}")
 
-        return Tree.load(f, mapper=PathData.deserialize_mapper)
+        parts = pure.parts[1:] if pure.anchor else pure.parts
+        regex = "/".join(_glob_part_to_regex(part) for part in parts)
+        anchor = f"^{re.escape(pure.anchor)}" if pure.anchor else "(?:^|/)"
+        regexes.append(f"{anchor}{regex}\\Z")
+    return re.compile("|".join(f"(?:{r})" for r in regexes)) if regexes else None
 
 
-def populate_filesize(*, node: Node | Tree, refresh: bool = False) -> Node | Tree:
-    if isinstance(node, Tree):
-        root = node.first_child()
+def is_match(path: Path, pattern: re.Pattern | None = None) -> bool:
+    return pattern is not None and pattern.search(str(path)) is not None
 
-        if root is not None:
-            populate_filesize(node=root, refresh=refresh)
-        return node
 
-    for child in node.children:
-        populate_filesize(node=child, refresh=refresh)
+def leaf_nodes(node: Node | Tree) -> list[Node]:
+    # Collect all leaves below node in pre-order (a leaf node is its own
+    # only leaf), uses an explicit stack instead of nutree's recursive iterators
+    if isinstance(node, Node) and not node.children:
+        return [node]
+
+    leaves = []
+    stack = list(reversed(node.children))
+
+    while stack:
+        n = stack.pop()
+        if n.children:
+            stack.extend(reversed(n.children))
+        else:
+            leaves.append(n)
+    return leaves
+
+
+def zip_nodes(tree: Tree) -> list[Node]:
+    # Collect all zip nodes in pre-order, without descending into them as zips are
+    # never nested, so that the (much larger) contents of archives are not visited
+    zips = []
+    stack = list(reversed(tree.children))
+
+    while stack:
+        n = stack.pop()
+        if n.data.is_zip:
+            zips.append(n)
+        else:
+            stack.extend(reversed(n.children))
+    return zips
+
 
-    if (node.data.is_dir and refresh) or node.data.size is None:
-        node.data.size = sum(c.data.size for c in node.children)
-    return node
+@lru_cache
+def compile_classifier(patterns: tuple[str, ...]) -> Callable[[str], int | None]:
+    # Compile fnmatch patterns into a single regex in which each pattern is a
+    # named group, the returned function maps a path to the index of the first
+    # matching pattern (or None), with a single regex match per call
+    if not patterns:
+        return lambda path: None
+
+    match = re.compile(
+        "|".join(f"(?P<g{i}>{translate(p)})" for i, p in enumerate(patterns))
+    ).match
+
+    def classify(path: str) -> int | None:
+        if m := match(path):
+            return int(cast(str, m.lastgroup)[1:])
+        return None
+
+    return classify
+
+
+def deepcopy(tree: Tree, select: Callable[[Node], bool] | None = None) -> Tree:
+    # Clone all nodes directly in memory, copying each node's data so the
+    # copy can be mutated independently (this does not re-stat any paths).
+    # If given, nodes that are not selected are skipped along with all their
+    # descendants, which are never visited.
+    new_tree: Tree = Tree(tree.name)
+    stack: list[tuple[Node, Node | Tree]] = [
+        (node, new_tree)
+        for node in reversed(tree.children)
+        if select is None or select(node)
+    ]
+
+    while stack:
+        node, parent = stack.pop()
+        clone = parent.add(replace(node.data))
+        stack.extend(
+            (child, clone)
+            for child in reversed(node.children)
+            if select is None or select(child)
+        )
+    return new_tree
+
+
+def _scan_directory(
+    dirpath: str,
+    *,
+    follow_symlinks: bool = False,
+    filter_fn: Callable | None = None,
+) -> tuple[OSError | None, list[str], list[tuple[str, bool, int]]]:
+    # List a single directory, splitting its entries into subdirectories and
+    # (path, is_dir, size) leaves. Errors when listing are returned instead of
+    # raised so that the caller can decide what to do with them.
+    try:
+        with os.scandir(dirpath) as it:
+            entries = [
+                entry
+                for entry in it
+                if filter_fn is None or filter_fn(Path(entry.path))
+            ]
+    except OSError as e:
+        return e, [], []
+
+    dirs, files = [], []
+    for entry in entries:
+        # Entries whose type cannot be determined are treated as files, like
+        # `os.walk` does
+        try:
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                dirs.append(entry.path)
+                continue
+
+            # Symlinks to directories that are not followed are kept as empty
+            # directory leaves, which get archived as a directory entry
+            if entry.is_dir():
+                files.append((entry.path, True, 0))
+                continue
+        except OSError:
+            pass
+
+        # Files are sized by what they point to, as that is what ends up in the
+        # archive
+        try:
+            size = entry.stat().st_size
+        except OSError as e:
+            # Dangling symlinks cannot be archived, skip them instead of failing
+            log.warning(f"Skipping {entry.path}, it cannot be read ({e.strerror}).")
+            continue
+        files.append((entry.path, False, size))
+    return None, dirs, files
 
 
 def directory_tree(
@@ -259,41 +650,62 @@ def directory_tree(
     on_error: Callable | None = None,
     follow_symlinks: bool = False,
     filter_fn: Callable | None = None,
+    workers: int = 8,
 ) -> Tree:
     path = Path(path).resolve()
     tree: Tree = Tree("Directory Listing")
     root = tree.add(PathData(path=path))
-    path2node = {str(root.data.path.resolve()): root}
-    skipped_dirs = set()
 
     if not path.exists():
         raise FileNotFoundError(f"Directory {path} does not exist!")
 
-    for dirpath, dirnames, filenames in Path(path).walk(
-        on_error=on_error, follow_symlinks=follow_symlinks
-    ):
-        if filter_fn is not None and (
-            not filter_fn(dirpath) or dirpath.parent in skipped_dirs
-        ):
-            skipped_dirs.add(dirpath)
-            continue
+    # Directories are listed concurrently using `os.scandir`, whose entries cache
+    # their type and stat results, while the tree itself is only ever modified from
+    # this thread. Each pending listing holds on to its directory's node, so no
+    # path to node lookup is needed, and since the root is resolved all entry
+    # paths are already absolute.
+    scan = partial(
+        _scan_directory, follow_symlinks=follow_symlinks, filter_fn=filter_fn
+    )
 
-        parent = path2node[str(dirpath.resolve())]
-
-        for dirname in dirnames:
-            if filter_fn is None or filter_fn(dirpath / dirname):
-                child_data = PathData(path=dirpath / dirname)
-                child = parent.add(child_data)
-                path2node[str(child.data.path.resolve())] = child
-        for filename in filenames:
-            if filter_fn is None or filter_fn(dirpath / filename):
-                child_data = PathData(
-                    path=dirpath / filename,
-                    size=(dirpath / filename).stat().st_size,
-                )
-                child = parent.add(child_data)
-                path2node[str(child.data.path.resolve())] = child
-    populate_filesize(node=root)
+    # Files add their size to their parent directory during the walk
+    dir_nodes = [root]
+    root.data.size = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = (
+            {executor.submit(scan, str(path)): root}
+            if filter_fn is None or filter_fn(path)
+            else {}
+        )
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                parent = pending.pop(future)
+                error, dirs, files = future.result()
+
+                if error is not None:
+                    if on_error is not None:
+                        on_error(error)
+                    continue
+
+                # A directory's children are added all at once, so their order
+                # does not depend on the order in which directories are listed
+                for dirpath in dirs:
+                    child_data = PathData(path=Path(dirpath), is_dir=True, size=0)
+                    child = parent.add(child_data)
+                    dir_nodes.append(child)
+                    pending[executor.submit(scan, dirpath)] = child
+                for filepath, is_dir, size in files:
+                    parent.add(PathData(path=Path(filepath), is_dir=is_dir, size=size))
+                    parent.data.size += size
+
+    # Directories are created before any of their descendants, so propagating
+    # sizes up in reverse creation order sums them bottom-up without re-traversal
+    for node in reversed(dir_nodes[1:]):
+        node.parent.data.size += node.data.size
     return tree
 
 
@@ -304,8 +716,8 @@ def partition_tree_by_fnmatches(
 
     Warning:
         Expects partitions to have disjoint set of leaf nodes (intermediate nodes
-        can be shared), all nodes that do not match any pattern will be mapped to
-        a separate subtree.
+        can be shared), a leaf that matches multiple patterns raises a RuntimeError.
+        All nodes that do not match any pattern will be mapped to a separate subtree.
 
     Args:
         tree (Tree): The tree to partition.
@@ -329,87 +741,104 @@ def partition_tree_by_fnmatches(
     else:
         default_groupname = reverse_patterns[None]
 
-    # Split all leaf node based on matches
-    all_leafs = {n.data.path: n for n in tree.find_all(match=lambda n: n.is_leaf())}
-    matched_leafs = {
-        pattern_name: {
-            n.data.path: n
-            for n in filter(
-                lambda n: fnmatch(n.data.path, pattern_expr), all_leafs.values()
-            )
-        }
-        for pattern_name, pattern_expr in patterns.items()
-        if pattern_name != default_groupname
-    }
-    matched_leafs[default_groupname] = {
-        n.data.path: n
-        for n in filter(
-            lambda n: not any(
-                fnmatch(n.data.path, pattern_expr)
-                for pattern_expr in patterns.values()
-                if pattern_expr
-            ),
-            all_leafs.values(),
-        )
+    # Classify all leaf nodes in a single pass. To ensure partitions are disjoint,
+    # a leaf is also matched against all patterns after the one it was assigned to
+    pattern_names = [name for name in patterns if name != default_groupname]
+    pattern_exprs = tuple(cast(str, patterns[name]) for name in pattern_names)
+    classify = compile_classifier(pattern_exprs)
+    overlaps = [
+        compile_classifier(pattern_exprs[i + 1 :]) for i in range(len(pattern_exprs))
+    ]
+    partition_sizes: dict[str, dict[Path, int]] = {
+        pattern_name: defaultdict(int)
+        for pattern_name in [*pattern_names, default_groupname]
     }
 
-    # Ensure no leaf node overlap and that we didn't miss any nodes
-    assert all(
-        set(u).isdisjoint(v)
-        for u, v in itertools.combinations(matched_leafs.values(), 2)
-    )
-    all_matched_leafs = reduce(set.union, (set(l) for l in matched_leafs.values()))
-    assert all_matched_leafs == set(all_leafs)
+    for n in leaf_nodes(tree):
+        idx = classify(leaf_path := str(n.data.path))
 
-    # Filter tree into all subtrees, recalculate file sizes, deepcopy all and filter out empty trees
-    subtrees = {
-        pattern_name: tree.filtered(lambda n: n.data.path in leafs)
-        for pattern_name, leafs in matched_leafs.items()
-    }
-    subtrees = {
-        pattern_name: cast(Tree, populate_filesize(node=deepcopy(st), refresh=True))
-        for pattern_name, st in subtrees.items()
-        if st.count
-    }
-    for pattern_name, st in subtrees.items():
+        if idx is not None and (other := overlaps[idx](leaf_path)) is not None:
+            raise RuntimeError(
+                f"Leaf {leaf_path} matches both the {pattern_names[idx]} and "
+                f"{pattern_names[idx + 1 + other]} partitions!"
+            )
+        pattern_name = default_groupname if idx is None else pattern_names[idx]
+
+        # Attribute the leaf's size to itself and all of its ancestors, but only
+        # within the partition it was assigned to
+        sizes, leaf_size, ancestor = partition_sizes[pattern_name], n.data.size or 0, n
+        while ancestor is not None:
+            sizes[ancestor.data.path] += leaf_size
+            ancestor = ancestor.parent
+
+    # Every node that was attributed a size above is a leaf of the partition or one
+    # of its ancestors, so copy exactly those nodes out of the tree and assign them
+    # their partition's sizes, skipping empty partitions
+    subtrees: dict[str, Tree] = {}
+
+    for pattern_name, sizes in partition_sizes.items():
+        if not sizes:
+            continue
+
+        st = deepcopy(tree, select=lambda n: n.data.path in sizes)
         st.name = pattern_name.title()
+        subtrees[pattern_name] = st
+
+        for n in st.iterator(method=IterMethod.LEVEL_ORDER):
+            n.data.size = sizes[n.data.path]
     return subtrees
 
 
 def split_into_chunks(
     *, tree: Tree, chunk_size: int = _bytes_from_str("200MB"), min_zip_depth: int = 1
 ) -> Tree:
-    def find_splits(
-        *, node: Node, splits: dict[tuple[str | int, int], list[Node]]
-    ) -> None:
-        # First recurse and propagate the has_zip_descendants label up
-        for child in node.children:
-            find_splits(node=child, splits=splits)
-            node.data.has_zip_descendants = (
-                node.data.has_zip_descendants or child.data.has_zip_descendants
-            )
+    def find_splits(*, node: Node, splits: list[tuple[Node, int, list[Node]]]) -> None:
+        # Visit nodes in post-order with an explicit stack instead of recursing, so
+        # that children are split before their parent and in the same order as a
+        # recursive walk, without being bound by the recursion limit. The depth is
+        # carried along as `Node.depth` walks all the way up to the root.
+        stack: list[tuple[Node, int, bool]] = [(node, node.depth(), False)]
+
+        while stack:
+            node, depth, expanded = stack.pop()
+
+            if not expanded:
+                stack.append((node, depth, True))
+                stack.extend(
+                    (child, depth + 1, False) for child in reversed(node.children)
+                )
+                continue
 
-        # Split node if too big, making sure to exclude children with zip descendants
-        # if node.data.size > chunk_size or node.is_top():
-        if node.data.size > chunk_size or node.depth() <= min_zip_depth:
-            children = natsorted(
-                filter(lambda n: not n.data.has_zip_descendants, node.children),
-                key=lambda n: (n.data.path.is_file(), str(n.data.path)),
-            )
-            cumulative_sizes = list(itertools.accumulate(c.data.size for c in children))
-            groups_lengths = [
-                len(g)
-                for g in mitertools.split_when(
-                    cumulative_sizes,
-                    lambda x, y: x // chunk_size != y // chunk_size,
+            # Propagate the has_zip_descendants label up
+            for child in node.children:
+                node.data.has_zip_descendants = (
+                    node.data.has_zip_descendants or child.data.has_zip_descendants
                 )
-            ]
-            children_iter = iter(children)
 
-            for i, group_size in enumerate(groups_lengths):
-                group_children = mitertools.take(group_size, children_iter)
-                splits[(node.data_id, i)] = group_children
-                node.data.has_zip_descendants = True
+            # Split node if too big, making sure to exclude children with zip descendants
+            # if node.data.size > chunk_size or node.is_top():
+            if node.data.size > chunk_size or depth <= min_zip_depth:
+                # Siblings share their parent's path, so natural ordering on their
+                # names alone is equivalent and much cheaper than on the full path
+                children = natsorted(
+                    filter(lambda n: not n.data.has_zip_descendants, node.children),
+                    key=lambda n: (not n.data.is_dir, n.data.path.name),
+                )
+                # Group children in a single pass, a new group is started whenever
+                # the cumulative size crosses into the next multiple of chunk_size
+                groups: list[list[Node]] = []
+                cumulative_size, prev_bucket = 0, -1
+
+                for c in children:
+                    cumulative_size += c.data.size
+                    if (bucket := cumulative_size // chunk_size) != prev_bucket:
+                        groups.append([])
+                        prev_bucket = bucket
+                    groups[-1].append(c)
+
+                for i, group_children in enumerate(groups):
+                    splits.append((node, i, group_children))
+                    node.data.has_zip_descendants = True
 
     def validate_ziptree(node: Node, _memo: Any) -> SkipBranch | StopTraversal | None:
         if node.data.is_zip:
@@ -424,23 +853,20 @@ def split_into_chunks(
         # Empty tree
         return tree
 
-    splits: dict[tuple[str | int, int], list[Node]] = {}
-    raw_files = set(
-        str(n.data.path) for n in tree.find_all(match=lambda n: n.is_leaf())
-    )
+    splits: list[tuple[Node, int, list[Node]]] = []
+    raw_files = set(str(n.data.path) for n in leaf_nodes(tree))
 
     # Find places for zips without modifying tree topology!
     find_splits(node=root, splits=splits)
 
-    # Create new zipnodes for every zip
-    for (data_id, i), group_children in splits.items():
-        node = tree.find(data_id=data_id)
-        assert isinstance(node, Node)
-
+    # Create new zipnodes for every zip, splits hold on to their node so no
+    # (linear time) lookup of the node by its data_id is needed
+    for node, i, group_children in splits:
         zipnode_data = PathData(
             path=node.data.path.with_name(f"{node.data.path.stem}_{i}.zip"),
-            size=sum(c.data.size for c in group_children),
+            is_dir=False,
             is_zip=True,
+            size=sum(c.data.size for c in group_children),
         )
         zipnode = node.up().add(zipnode_data)
 
@@ -453,9 +879,7 @@ def split_into_chunks(
             node.remove()
 
     # Ensure no files are missed
-    zip_files = set(
-        str(n.data.path) for n in tree.find_all(match=lambda n: n.is_leaf())
-    )
+    zip_files = set(str(n.data.path) for n in leaf_nodes(tree))
 
     if diff := raw_files - zip_files:
         raise RuntimeError(f"Detected missing files in ziptree: {diff}")
@@ -503,6 +927,12 @@ def upload(
     min_zip_depth: int = 1,
     follow_symlinks: bool = False,
     overwrite: bool = False,
+    workers: int = 8,
+    stream: bool = False,
+    public: bool | None = None,
+    assume_yes: bool = False,
+    compression: Literal["lzma", "deflated", "stored"] = "lzma",
+    compresslevel: int | None = None,
 ) -> None:
     """Auto-partition dataset into archives and upload them to an S3 bucket.
 
@@ -512,10 +942,13 @@ def upload(
             At most each (deflated) zip will be one and a half time this size.
         exclude (list[str], optional): Space separated list of path exclusion
             patterns. Warning something like "logs/" will match any path that
-            contains logs. Internally uses `Path.match`.
+            contains logs. Patterns follow `Path.match` semantics, and are compiled
+            into a single regex once.
         tmp_dir (Path, optional): Location of scratch dir
             used to build archives. Useful if the `chunk_size` is more than a
-            few GBs. Defaults to OS default tmp directory.
+            few GBs, as up to `workers` archives are kept in it at once, so it
+            needs room for about `workers` times `chunk_size`. Defaults to OS
+            default tmp directory.
         trees_dir (Path, optional): Location in which to save trees. Defaults to `path`. 
         keep (bool, optional): If true, the temporary directory is kept. Useful for
             debugging or for making a local archive instead of using S3 if
@@ -530,22 +963,46 @@ def upload(
         overwrite (bool, optional): If true, objects in the S3 bucket will be
             overwritten by new ones that share the same key, otherwise the
             conflicting uploads are skipped.
+        workers (int, optional): Number of archives that are compressed or uploaded
+            concurrently. At most this many archives are in `tmp_dir` at once, so
+            scratch space needs grow with `workers` times `chunk_size`. Also the
+            number of directories that are listed concurrently. Default 8.
+        stream (bool, optional): If true, archives are compressed straight into a
+            multipart S3 upload instead of being written to `tmp_dir` first. Only
+            used when uploading to S3 without `keep`. Each archive then buffers up
+            to six 64MB parts in memory, so about `workers` times 384MB in total.
+        public (bool, optional): If true, uploaded artifacts are made public. If not
+            set, you will be asked, or they are kept private with `assume_yes`.
+        assume_yes (bool, optional): If true, skip all confirmation prompts and
+            proceed as if they were all confirmed. Useful for scripted runs.
+        compression (str, optional): Compression method of archives, media files and
+            nested archives are always stored as-is. Default lzma.
+        compresslevel (int, optional): Compression level, only used by deflated
+            where it defaults to 1 (fastest), which is close in size to higher
+            levels for most datasets at a fraction of the CPU time.
     """
     if min_zip_depth <= 0:
         raise ValueError("Argument `min_zip_depth` must be at least 1.")
+    if workers <= 0:
+        raise ValueError("Argument `workers` must be at least 1.")
+    if compression == "deflated" and compresslevel is None:
+        compresslevel = 1
 
     # Create filesystem tree and split it into zip-sized chunks
+    exclude_pattern = compile_patterns(exclude)
+
     def path_filter(p):
-        keep = (
-            is_not_hidden(p) and is_not_dunder(p) and not is_match(p, patterns=exclude)
-        )
-        if not keep:
+        keep = is_included(p) and not is_match(p, exclude_pattern)
+        if not keep and log.isEnabledFor(logging.DEBUG):
             log.debug(f"Excluding {p} ({_bytes_to_str(p.stat().st_size)})")
         return keep
 
     with Status("Building Tree...", spinner="bouncingBall") as status:
         file_tree = directory_tree(
-            path, filter_fn=path_filter, follow_symlinks=follow_symlinks
+            path,
+            filter_fn=path_filter,
+            follow_symlinks=follow_symlinks,
+            workers=workers,
         )
 
     with Status("Partitioning Tree...", spinner="bouncingBall") as status:
@@ -578,29 +1035,101 @@ def upload(
         slim_tree.print(repr="{node.data}")
         print()
 
-    if not questionary.confirm("Confirm zip partition?", default=False).ask():
-        sys.exit(1)
+    # Confirm partition and all s3 settings at once, ensure we don't accidentally
+    # upload anything
+    is_remote = s3.bucket is not None and s3.prefix is not None
+    questions = {"partition": "Confirm zip partition?"}
+
+    if is_remote:
+        questions["remote"] = (
+            "Not running in local mode, this will upload artifacts to S3. Confirm?"
+        )
+        if public is None:
+            questions["public"] = "Make uploaded artifacts public?"
 
-    # Confirm all s3 settings, ensure we don't accidentally upload anything
-    if s3.bucket is not None and s3.prefix is not None:
-        if not questionary.confirm(
-            "Not running in local mode, this will upload artifacts to S3. Confirm?",
-            default=False,
-        ).ask():
-            sys.exit(1)
+    # Prompts are only created when needed, they require an interactive terminal
+    if assume_yes:
+        answers = {name: True for name in questions if name != "public"}
+    else:
+        import questionary
 
-        public = questionary.confirm(
-            "Make uploaded artifacts public?", default=False
+        answers = questionary.form(
+            **{
+                name: questionary.confirm(message, default=False)
+                for name, message in questions.items()
+            }
         ).ask()
-        s3_client = boto3.client("s3")
-        exists: Callable = partial(check_exists, s3_client=s3_client, conn=s3)
+
+    if not answers.get("partition") or (is_remote and not answers.get("remote")):
+        sys.exit(1)
+
+    if is_remote:
+        # Imported here as boto3 takes a while to import and is not needed for dry
+        # runs or for inspecting trees
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        public = bool(answers.get("public", public))
+
+        # Upload parts of large archives concurrently, this stacks with the
+        # per-archive concurrency given by `workers`
+        transfer_config = TransferConfig(
+            multipart_threshold=_bytes_from_str("64MB"),
+            multipart_chunksize=_bytes_from_str("64MB"),
+            max_concurrency=16,
+            use_threads=True,
+        )
+
+        # A single client is shared by all threads, size its connection pool so
+        # that concurrent part uploads do not queue up behind each other, and back
+        # off adaptively when throttled instead of failing the whole archive
+        s3_client = boto3.client(
+            "s3",
+            config=Config(
+                max_pool_connections=max(32, workers * transfer_config.max_concurrency),
+                retries={"max_attempts": 10, "mode": "adaptive"},
+                tcp_keepalive=True,
+            ),
+        )
+
+        def make_exists(prefix: str | None) -> Callable:
+            # List all objects of a partition at once instead of issuing a HeadObject
+            # request per archive, falling back to the latter if listing is denied
+            try:
+                existing = list_objects(
+                    s3_client=s3_client, conn=s3, prefix=Path(prefix or "") / path.name
+                )
+            except ClientError:
+                return partial(check_exists, s3_client=s3_client, conn=s3)
+            return lambda key: existing.get(str(Path(s3.prefix or "") / key), 0)
+
         upload: Callable = partial(
-            upload_file, s3_client=s3_client, conn=s3, public=public
+            upload_file,
+            s3_client=s3_client,
+            conn=s3,
+            public=public,
+            transfer_config=transfer_config,
+        )
+        open_stream = (
+            partial(
+                S3MultipartWriter,
+                s3_client=s3_client,
+                conn=s3,
+                public=public,
+                part_size=transfer_config.multipart_chunksize,
+            )
+            if stream and not keep
+            else None
         )
     else:
         # Do not check existence if not uploading
         upload = lambda src, dst: log.info(f"Would have uploaded {src} to {dst}.")
-        exists = lambda *args, **kwargs: 0
+        make_exists = lambda prefix: lambda *args, **kwargs: 0
+        open_stream = None
+
+    # Scratch space that has to outlive all archives, cleaned up once they're uploaded
+    scratch = contextlib.ExitStack()
 
     if tmp_dir:
         tmp_dir.mkdir(exist_ok=True, parents=True)
@@ -613,75 +1142,179 @@ def upload(
             context = partial(contextlib.nullcontext, enter_result=tmpdir)
             log.info(f"Using tempdir {tmpdir}")
     elif not keep:
-        # We're not keeping the tempdir, so we can safely re-enter into a new
-        # temporary directory every time which helps keep it a manageable size
-        context = partial(
-            cast(Callable, tempfile.TemporaryDirectory),
-            dir=tmp_dir.resolve() if tmp_dir is not None else None,
-            delete=True,
+        # We're not keeping the tempdir, so share a single one between all archives
+        # and delete each archive once uploaded which helps keep it a manageable size
+        tmpdir = scratch.enter_context(
+            tempfile.TemporaryDirectory(
+                dir=tmp_dir.resolve() if tmp_dir is not None else None, delete=True
+            )
         )
+        context = partial(contextlib.nullcontext, enter_result=tmpdir)
+
+    # Zip up all descendants of a zip node and hand the archive off to be uploaded,
+    # this is called concurrently from worker threads, one zip node per call
+    def write_members(archive: zipfile.ZipFile, node: Node) -> None:
+        leaves = leaf_nodes(node)
+
+        # Let the kernel read ahead the next few members in the background
+        # while the current one is being compressed. Members that fit in a single
+        # copy buffer are skipped, they are read in one go anyway and the hint
+        # would only add an extra open and close per file.
+        ahead = [
+            not n.data.is_dir and (n.data.size or 0) >= _COPY_BUFSIZE for n in leaves
+        ]
+        for n in compress(leaves[:_READAHEAD_FILES], ahead):
+            readahead(n.data.path)
+        for i, n in enumerate(leaves):
+            if (i + _READAHEAD_FILES) < len(leaves) and ahead[i + _READAHEAD_FILES]:
+                readahead(leaves[i + _READAHEAD_FILES].data.path)
+            write_to_archive(
+                archive,
+                n.data.path,
+                arcname=n.data.path.relative_to(node.data.path.parent),
+                is_dir=bool(n.data.is_dir),
+            )
 
-    # Callable used to visit tree, will zip up all descendant of a zip node and upload it
-    def upload_ziptree(
+    def compress_zipnode(
         node: Node,
-        memo: Any,
         *,
         prefix: str | None,
         context: Callable,
+        exists: Callable | None,
         update_fn: UpdateFn,
-    ) -> SkipBranch | None:
-        if not node.data.is_zip:
-            return None
-
+        upload_executor: ThreadPoolExecutor,
+        pending: threading.BoundedSemaphore,
+    ) -> Future | None:
         object_key = Path(prefix or "") / node.data.path.relative_to(path.parent)
         update_fn(description=f"Compressing {node.data.path.name}")
 
-        if not overwrite and (zip_size := exists(key=object_key)):
+        if exists is not None and (zip_size := exists(key=object_key)):
             log.info(
                 f"Skipping {object_key} as objects with the same key exists in bucket."
             )
             node.data.zip_size = zip_size
             update_fn(advance=1)
-            raise SkipBranch
+            return None
+
+        if open_stream is not None:
+            # Compress straight into a multipart upload, without a local copy
+            update_fn(description=f"Streaming {node.data.path.name}")
+            try:
+                with open_stream(object_key, expected_size=node.data.size) as sink:
+                    with zipfile.ZipFile(
+                        sink,
+                        mode="w",
+                        compression=_ZIP_COMPRESSION[compression],
+                        compresslevel=compresslevel,
+                    ) as archive:
+                        write_members(archive, node)
+                node.data.zip_size = sink.nbytes
+            except ClientError as e:
+                log.error(f"Failed to upload {object_key}.")
+                log.error(e)
+            update_fn(advance=1)
+            return None
 
-        with context() as tmpdir:
+        # Bound the number of archives in scratch space, counting the ones that are
+        # still being written, a slot is only freed once its archive was uploaded.
+        # The archive has to outlive this call, it is cleaned up after its upload.
+        pending.acquire()
+        cleanup = contextlib.ExitStack()
+        cleanup.callback(pending.release)
+        try:
+            tmpdir = cleanup.enter_context(context())
             zip_path = Path(tmpdir) / object_key
             zip_path.parent.mkdir(exist_ok=True, parents=True)
 
+            if not keep:
+                cleanup.callback(zip_path.unlink, missing_ok=True)
+
             with zipfile.ZipFile(
-                zip_path, mode="w", compression=zipfile.ZIP_LZMA
+                zip_path,
+                mode="w",
+                compression=_ZIP_COMPRESSION[compression],
+                compresslevel=compresslevel,
             ) as archive:
                 if (s3.bucket is not None or s3.prefix is not None) or keep:
-                    for n in node.find_all(match=lambda n: n.is_leaf(), add_self=True):
-                        archive.write(
-                            n.data.path,
-                            arcname=n.data.path.relative_to(node.data.path.parent),
-                        )
+                    write_members(archive, node)
             node.data.zip_size = zip_path.stat().st_size
+        except BaseException:
+            cleanup.close()
+            raise
+
+        return upload_executor.submit(
+            upload_zipnode,
+            node,
+            zip_path=zip_path,
+            object_key=object_key,
+            cleanup=cleanup,
+            update_fn=update_fn,
+        )
+
+    def upload_zipnode(
+        node: Node,
+        *,
+        zip_path: Path,
+        object_key: Path,
+        cleanup: contextlib.ExitStack,
+        update_fn: UpdateFn,
+    ) -> None:
+        try:
             update_fn(description=f"Uploading {node.data.path.name}")
             upload(zip_path, object_key)
+        finally:
+            cleanup.close()
         update_fn(advance=1)
-        raise SkipBranch
 
-    for i, (prefix, tree) in enumerate(subtrees.items()):
-        with Progress(
-            TextColumn(
-                f"(Partition {i+1}/{len(subtrees)}) "
-                + "[progress.description]{task.description}"
-            ),
-            BarColumn(),
-            TaskProgressColumn(),
-            TimeRemainingColumn(elapsed_when_finished=True),
-        ) as progress:
-            task = progress.add_task(
-                "", total=len(tree.find_all(match=lambda n: n.data.is_zip))
-            )
-            update_fn = partial(progress.update, task)
-            tree.visit(
-                partial(
-                    upload_ziptree, prefix=prefix, context=context, update_fn=update_fn
-                )
-            )
+    with scratch:
+        for i, (prefix, tree) in enumerate(subtrees.items()):
+            zipnodes = zip_nodes(tree)
+            exists = make_exists(prefix) if not overwrite else None
+
+            with Progress(
+                TextColumn(
+                    f"(Partition {i+1}/{len(subtrees)}) "
+                    + "[progress.description]{task.description}"
+                ),
+                BarColumn(),
+                TaskProgressColumn(),
+                TimeRemainingColumn(elapsed_when_finished=True),
+                refresh_per_second=2,
+            ) as progress, ThreadPoolExecutor(
+                max_workers=workers
+            ) as compress_executor, ThreadPoolExecutor(
+                max_workers=workers
+            ) as upload_executor:
+                task = progress.add_task("", total=len(zipnodes))
+                update_fn = partial(progress.update, task)
+                pending = threading.BoundedSemaphore(workers)
+                futures = [
+                    compress_executor.submit(
+                        compress_zipnode,
+                        node,
+                        prefix=prefix,
+                        context=context,
+                        exists=exists,
+                        update_fn=update_fn,
+                        upload_executor=upload_executor,
+                        pending=pending,
+                    )
+                    for node in zipnodes
+                ]
+
+                # Surface the first error and do not start compressing any pending
+                # archives, the ones that are already compressed still get uploaded
+                try:
+                    upload_futures = [
+                        upload_future
+                        for future in as_completed(futures)
+                        if (upload_future := future.result()) is not None
+                    ]
+                    for future in as_completed(upload_futures):
+                        future.result()
+                except BaseException:
+                    compress_executor.shutdown(wait=True, cancel_futures=True)
+                    raise
 
     # Save all subtrees for future inspection
     ((trees_dir or path) / "trees").mkdir(exist_ok=True, parents=True)
@@ -701,7 +1334,7 @@ def upload(
 
 
 if __name__ == "__main__":
-    if boto3.__version__ != "1.35.31":
+    if version("boto3") != "1.35.31":
         log.warning(
             "Please use boto3==1.35.31 as other versions might fail to upload files!!"
         )